@@ -0,0 +1,160 @@
+""" Terminal-level scenarios - many PlaneModel boardings sharing one clock and a pool of gate agents
+
+A gate agent is needed to open boarding at a gate; it lets passengers from the door onto the jet bridge
+(the plane's boarding_queue) at most one every release_interval ticks and moves on to the next waiting
+flight once the last passenger is through. Passengers show up at the door according to the arrival
+process of their flight.
+
+Flights share gate agents and gates: boarding can only start once an agent is free and the previous flight
+at the same gate has finished boarding. An event-driven scheduler takes the flights in order of boarding
+time, works out when every passenger is released and boards the flight with the kernel straight away, as
+the gate is not free again before then. Every flight's model is created once by the scheduler and that very
+model is boarded, so the Mesa engine (which steps the models again, across all CPU cores) sees the same
+passengers.
+"""
+import heapq
+import statistics
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import arrivals
+import kernel
+from plane import PlaneModel
+
+
+class Flight:
+    """ A single departure boarded at a given gate, arrivals being one of the processes from arrivals.py """
+    def __init__(self, name, gate, boarding_open, method='Random', shuffle_enable=True, common_bags='normal',
+                 arrivals=None, seed=None):
+        self.name = name
+        self.gate = gate
+        self.boarding_open = boarding_open
+        self.method = method
+        self.shuffle_enable = shuffle_enable
+        self.common_bags = common_bags
+        self.arrivals = arrivals
+        self.seed = seed
+
+    def create_model(self, seed=None):
+        """ The flight's model, seeded with seed unless the flight has a seed of its own """
+        if self.seed is not None:
+            seed = self.seed
+        return PlaneModel(self.method, self.shuffle_enable, self.common_bags, seed=seed, arrivals=self.arrivals)
+
+    def __str__(self):
+        return "{} (gate {}, opens at {})".format(self.name, self.gate, self.boarding_open)
+
+
+def board_flight(model):
+    """ Boards a single flight by stepping its model; returns the step count """
+    while model.running:
+        model.step()
+    return model.schedule.steps
+
+
+class Scenario:
+    """ A set of flights sharing gate_agents agents which release one passenger per release_interval ticks
+
+    Flights without a seed of their own get one derived from seed.
+    """
+    def __init__(self, flights, gate_agents, release_interval=1, seed=None):
+        self.flights = sorted(flights, key=lambda f: f.boarding_open)
+        self.gate_agents = gate_agents
+        self.release_interval = release_interval
+        self.seed = seed
+        self.results = []
+
+    def schedule_gates(self):
+        """ Assigns gate agents and gates in order of boarding time
+
+        Returns (flight, start, gate_wait, model, steps) per flight. Every passenger's arrival in the
+        returned models is replaced by the tick at which the gate agent releases them, counted from the
+        start of boarding. gate_wait is the part of the delay spent waiting for the gate to be vacated.
+        """
+        free_at = [0] * self.gate_agents
+        heapq.heapify(free_at)
+        gate_free_at = {}
+        seeds = np.random.SeedSequence(self.seed).generate_state(len(self.flights))
+        plan = []
+        for flight, seed in zip(self.flights, seeds):
+            gate_free = max(flight.boarding_open, gate_free_at.get(flight.gate, 0))
+            start = max(gate_free, heapq.heappop(free_at))
+            # the door order is only known once the model has drawn its arrivals
+            model = flight.create_model(int(seed))
+            last = start - self.release_interval
+            for agent in reversed(model.boarding_queue):
+                last = max(flight.boarding_open + agent.arrival, last + self.release_interval)
+                agent.arrival = last - start
+            heapq.heappush(free_at, last + self.release_interval)
+            steps = kernel.run_boarding(model)
+            gate_free_at[flight.gate] = start + steps
+            plan.append((flight, start, gate_free - flight.boarding_open, model, steps))
+        return plan
+
+    def run(self, engine='kernel', processes=None):
+        """ Boards every flight and returns the per-flight results
+
+        engine='mesa' steps every model once more (processes=1 stays in this process) instead of taking
+        the step counts of the kernel, which are the same.
+        """
+        plan = self.schedule_gates()
+        if engine == 'kernel':
+            steps = [flight_steps for _, _, _, _, flight_steps in plan]
+        elif processes == 1:
+            steps = [board_flight(model) for _, _, _, model, _ in plan]
+        else:
+            with Pool(processes) as pool:
+                steps = pool.map(board_flight, [model for _, _, _, model, _ in plan],
+                                 chunksize=max(1, len(plan) // 64))
+
+        self.results = []
+        for (flight, start, gate_wait, _, _), flight_steps in zip(plan, steps):
+            self.results.append({
+                'flight': flight.name,
+                'gate': flight.gate,
+                'boarding_open': flight.boarding_open,
+                'gate_wait': gate_wait,
+                'agent_wait': start - flight.boarding_open - gate_wait,
+                'start': start,
+                'finish': start + flight_steps,
+                'boarding_time': flight_steps
+            })
+        return self.results
+
+    def summary(self):
+        """ Aggregates the results of the last run over all flights """
+        times = [r['boarding_time'] for r in self.results]
+        waits = [r['agent_wait'] for r in self.results]
+        gate_waits = [r['gate_wait'] for r in self.results]
+        return {
+            'flights': len(self.results),
+            'mean_boarding_time': statistics.mean(times),
+            'median_boarding_time': statistics.median(times),
+            'max_boarding_time': max(times),
+            'mean_agent_wait': statistics.mean(waits),
+            'max_agent_wait': max(waits),
+            'mean_gate_wait': statistics.mean(gate_waits),
+            'max_gate_wait': max(gate_waits),
+            'delayed_flights': sum(1 for r in self.results if r['start'] > r['boarding_open']),
+            'last_finish': max(r['finish'] for r in self.results)
+        }
+
+
+if __name__ == "__main__":
+    # A day of operations: 400 departures over 40 gates with 12 gate agents
+    rng = np.random.RandomState(0)
+    methods = list(PlaneModel.method_types.keys())
+    flights = []
+    for i in range(400):
+        flights.append(Flight("FL{:03d}".format(i), i % 40, int(rng.randint(0, 60000)),
+                              method=methods[rng.randint(len(methods))],
+                              arrivals=arrivals.Poisson(rng.uniform(0.1, 1.0)), seed=i))
+
+    scenario = Scenario(flights, gate_agents=12, release_interval=2)
+    start_time = time.perf_counter()
+    scenario.run()
+    print(f"Boarded {len(flights)} flights in {time.perf_counter() - start_time:.1f} s\n")
+    for key, value in scenario.summary().items():
+        print(f"  {key}: {value}")
@@ -0,0 +1,70 @@
+""" Arrival processes - when passengers show up at the door of the plane
+
+Every process is called with the passengers in boarding order and a numpy random generator and
+returns the arrival tick of each passenger, counted from the moment boarding opens.
+"""
+import numpy as np
+
+
+class Constant:
+    """ Passengers arrive in boarding order, one every interval ticks """
+    def __init__(self, interval):
+        self.interval = interval
+
+    def __call__(self, passengers, rng):
+        return [int(round(i * self.interval)) for i in range(len(passengers))]
+
+
+class Poisson:
+    """ Passengers arrive in boarding order, on average rate passengers per tick """
+    def __init__(self, rate):
+        self.rate = rate
+
+    def __call__(self, passengers, rng):
+        return [int(round(t)) for t in np.cumsum(rng.exponential(1 / self.rate, len(passengers)))]
+
+
+class GroupCalls:
+    """ Boarding groups are called one after another in the order they board
+
+    call_times holds the tick of every call, or a single number of ticks between consecutive calls.
+    After the call, passengers of the group need on average spread ticks to reach the door.
+    """
+    def __init__(self, call_times, spread=0):
+        self.call_times = call_times
+        self.spread = spread
+
+    def __call__(self, passengers, rng):
+        groups = []
+        for agent in passengers:
+            if agent.group not in groups:
+                groups.append(agent.group)
+        if isinstance(self.call_times, (int, float)):
+            calls = {group: i * self.call_times for i, group in enumerate(groups)}
+        elif len(self.call_times) >= len(groups):
+            calls = dict(zip(groups, self.call_times))
+        else:
+            raise ValueError("{} call times given for {} boarding groups".format(len(self.call_times), len(groups)))
+
+        arrivals = []
+        for agent in passengers:
+            delay = rng.exponential(self.spread) if self.spread > 0 else 0
+            arrivals.append(int(round(calls[agent.group] + delay)))
+        return arrivals
+
+
+class Stragglers:
+    """ Passengers follow a given process, but each one is late with probability fraction
+
+    Late passengers arrive on average delay ticks after they would have otherwise.
+    """
+    def __init__(self, process, fraction, delay):
+        self.process = process
+        self.fraction = fraction
+        self.delay = delay
+
+    def __call__(self, passengers, rng):
+        arrivals = self.process(passengers, rng)
+        late = rng.random_sample(len(passengers)) < self.fraction
+        return [arrival + int(round(rng.exponential(self.delay))) if is_late else arrival
+                for arrival, is_late in zip(arrivals, late)]
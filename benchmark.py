@@ -0,0 +1,34 @@
+""" Benchmarks - memory held by PlaneModel instances and the cost of stepping them """
+import time
+import tracemalloc
+
+from plane import PlaneModel
+
+
+def model_memory(count=200, method='Random'):
+    """ Average number of bytes allocated by a freshly created model """
+    tracemalloc.start()
+    models = [PlaneModel(method, seed=seed) for seed in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return size / count
+
+
+def step_time(count=50, method='Random', repeats=5):
+    """ Average time in seconds to board a model by stepping it, best of several repeats """
+    best = None
+    for _ in range(repeats):
+        models = [PlaneModel(method, seed=seed) for seed in range(count)]
+        start = time.perf_counter()
+        for model in models:
+            while model.running:
+                model.step()
+        elapsed = (time.perf_counter() - start) / count
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"Memory per model:      {model_memory() / 1024:.1f} KiB")
+    print(f"Boarding by stepping:  {step_time() * 1000:.2f} ms")
@@ -0,0 +1,356 @@
+""" Compiled boarding kernel - runs a whole PlaneModel boarding in a single call
+
+The kernel mirrors PassengerAgent.step and QueueActivation step for step, but keeps the passengers and the
+cabin patches in two integer tables (one row per passenger, one per cell) instead of Mesa agents. Every cell
+links the passengers in it in order of entry, like MultiGrid does, and the number of agents in the schedule
+is kept up to date rather than counted. Numba is used when it is installed, otherwise the very same
+functions run as plain Python over lists.
+"""
+import time
+
+import numpy as np
+
+# Passenger and patch state codes, shared with the agents
+from plane import INACTIVE, GOING, SHUFFLE_CHECK, SHUFFLE, BACK, BAGGAGE, SEATING, FINISHED, FREE, TAKEN
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """ Stand-in for numba.njit which leaves the function untouched """
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+# Cabin layout, cells are stored row by row as x * HEIGHT + y, with one spare row behind the last one
+WIDTH = 21
+HEIGHT = 7
+AISLE = 3
+CELLS = (WIDTH + 1) * HEIGHT
+ENTRANCE = AISLE
+
+# Columns of the passenger table, one row per passenger; NEXT and PREV link the passengers sharing a cell
+A_SEAT_X, A_SEAT_Y, A_BAGGAGE, A_ARRIVAL, A_STATE, A_SHUFFLE_DIST, A_X, A_Y, A_NORMAL, A_TAG, A_NEXT, A_PREV = range(12)
+# Columns of the cell table - patch attributes and the first and last passenger in the cell, in order of entry
+C_STATE, C_SHUFFLE, C_BACK, C_ALLOW, C_ONGOING, C_FIRST, C_LAST = range(7)
+# Rows of the queue table - normal agents, priority agents and the tags of the priority entries
+Q_NORMAL, Q_PRIO, Q_PRIO_TAG = range(3)
+# Counters - last priority tag handed out, length of the priority queue, agents in the schedule
+TAGS, PRIO_LEN, LIVE = range(3)
+
+
+@njit(cache=True)
+def _place(a, x, y, passengers, cells):
+    """ MultiGrid.place_agent - the passenger is appended to the contents of the cell """
+    agent = passengers[a]
+    cell = cells[x * HEIGHT + y]
+    agent[A_X] = x
+    agent[A_Y] = y
+    agent[A_NEXT] = -1
+    agent[A_PREV] = cell[C_LAST]
+    if cell[C_LAST] == -1:
+        cell[C_FIRST] = a
+    else:
+        passengers[cell[C_LAST]][A_NEXT] = a
+    cell[C_LAST] = a
+
+
+@njit(cache=True)
+def _move(a, m_x, m_y, passengers, cells):
+    """ PassengerAgent.move - MultiGrid.move_agent unlinks the passenger and appends it to the new cell """
+    agent = passengers[a]
+    cell = cells[agent[A_X] * HEIGHT + agent[A_Y]]
+    cell[C_STATE] = FREE
+    if agent[A_PREV] == -1:
+        cell[C_FIRST] = agent[A_NEXT]
+    else:
+        passengers[agent[A_PREV]][A_NEXT] = agent[A_NEXT]
+    if agent[A_NEXT] == -1:
+        cell[C_LAST] = agent[A_PREV]
+    else:
+        passengers[agent[A_NEXT]][A_PREV] = agent[A_PREV]
+    _place(a, agent[A_X] + m_x, agent[A_Y] + m_y, passengers, cells)
+    cells[agent[A_X] * HEIGHT + agent[A_Y]][C_STATE] = TAKEN
+
+
+@njit(cache=True)
+def _add_priority(a, passengers, queues, counters):
+    """ QueueActivation.add_priority """
+    agent = passengers[a]
+    if agent[A_TAG] != 0:
+        # re-adding a key to the OrderedDict keeps its original position
+        return
+    counters[TAGS] += 1
+    counters[LIVE] += 1
+    agent[A_TAG] = counters[TAGS]
+    queues[Q_PRIO][counters[PRIO_LEN]] = a
+    queues[Q_PRIO_TAG][counters[PRIO_LEN]] = counters[TAGS]
+    counters[PRIO_LEN] += 1
+
+
+@njit(cache=True)
+def _remove_priority(a, passengers, counters):
+    """ QueueActivation.safe_remove_priority """
+    if passengers[a][A_TAG] != 0:
+        passengers[a][A_TAG] = 0
+        counters[LIVE] -= 1
+
+
+@njit(cache=True)
+def _remove_normal(a, passengers, counters):
+    """ QueueActivation.safe_remove """
+    if passengers[a][A_NORMAL] != 0:
+        passengers[a][A_NORMAL] = 0
+        counters[LIVE] -= 1
+
+
+@njit(cache=True)
+def _agent_step(a, shuffle, passengers, cells, queues, counters):
+    """ PassengerAgent.step over the tables """
+    agent = passengers[a]
+    x = agent[A_X]
+    y = agent[A_Y]
+    front = cells[(x + 1) * HEIGHT + y]
+    if agent[A_STATE] == GOING and front[C_STATE] == FREE and front[C_SHUFFLE] == 0:
+        if front[C_BACK] == 0 or front[C_ALLOW] == 1:
+            front[C_ALLOW] = 0
+            _move(a, 1, 0, passengers, cells)
+            if shuffle:
+                if agent[A_X] + 1 == agent[A_SEAT_X]:
+                    agent[A_STATE] = SHUFFLE_CHECK
+            if agent[A_X] == agent[A_SEAT_X]:
+                if agent[A_BAGGAGE] > 0:
+                    agent[A_STATE] = BAGGAGE
+                else:
+                    agent[A_STATE] = SEATING
+
+    elif agent[A_STATE] == SHUFFLE:
+        if y == AISLE and front[C_STATE] == FREE:
+            if x == agent[A_SEAT_X]:
+                aisle = cells[x * HEIGHT + y]
+                agent[A_SHUFFLE_DIST] = aisle[C_SHUFFLE]
+                aisle[C_SHUFFLE] -= 1
+            _move(a, 1, 0, passengers, cells)
+            agent[A_SHUFFLE_DIST] -= 1
+            if agent[A_SHUFFLE_DIST] == 0:
+                agent[A_STATE] = BACK
+                if agent[A_X] - agent[A_SEAT_X] == 2:
+                    _remove_priority(a, passengers, counters)
+                    _add_priority(a, passengers, queues, counters)
+        else:
+            if y > AISLE and cells[x * HEIGHT + y - 1][C_STATE] == FREE:
+                _move(a, 0, -1, passengers, cells)
+            elif y < AISLE and cells[x * HEIGHT + y + 1][C_STATE] == FREE:
+                _move(a, 0, 1, passengers, cells)
+
+    elif agent[A_STATE] == BACK:
+        behind = cells[(x - 1) * HEIGHT + y]
+        if behind[C_STATE] == FREE and behind[C_ALLOW] == 0:
+            _move(a, -1, 0, passengers, cells)
+            if agent[A_X] == agent[A_SEAT_X]:
+                agent[A_STATE] = SEATING
+                behind[C_BACK] -= 1
+                if behind[C_BACK] == 0:
+                    behind[C_ONGOING] = 0
+
+    elif agent[A_STATE] == BAGGAGE:
+        if agent[A_BAGGAGE] > 1:
+            agent[A_BAGGAGE] -= 1
+        else:
+            agent[A_STATE] = SEATING
+
+    elif agent[A_STATE] == SEATING:
+        if agent[A_SEAT_Y] < AISLE:
+            _move(a, 0, -1, passengers, cells)
+        else:
+            _move(a, 0, 1, passengers, cells)
+        if agent[A_Y] == agent[A_SEAT_Y]:
+            agent[A_STATE] = FINISHED
+            _remove_normal(a, passengers, counters)
+            _remove_priority(a, passengers, counters)
+
+    if agent[A_STATE] == SHUFFLE_CHECK:
+        front = cells[(agent[A_X] + 1) * HEIGHT + agent[A_Y]]
+        if front[C_STATE] == FREE and front[C_ONGOING] == 0:
+            row = agent[A_SEAT_X]
+            if agent[A_SEAT_Y] < AISLE:
+                first, last, direction = AISLE - 1, agent[A_SEAT_Y], -1
+            else:
+                first, last, direction = AISLE + 1, agent[A_SEAT_Y], 1
+            # PlaneModel.get_passenger is the first passenger in the cell; everyone in the way must be seated
+            shuffle_count = 0
+            for column in range(first, last, direction):
+                local_agent = cells[row * HEIGHT + column][C_FIRST]
+                if local_agent != -1:
+                    if passengers[local_agent][A_STATE] != FINISHED:
+                        return
+                    shuffle_count += 1
+            if shuffle_count != 0:
+                aisle = cells[row * HEIGHT + AISLE]
+                aisle[C_SHUFFLE] = shuffle_count
+                aisle[C_BACK] = shuffle_count
+                aisle[C_ALLOW] = 1
+                front[C_ONGOING] = 1
+                for column in range(first, last, direction):
+                    local_agent = cells[row * HEIGHT + column][C_FIRST]
+                    if local_agent != -1:
+                        passengers[local_agent][A_STATE] = SHUFFLE
+                        _remove_normal(local_agent, passengers, counters)
+                        _add_priority(local_agent, passengers, queues, counters)
+            agent[A_STATE] = GOING
+
+
+@njit(cache=True)
+def _board(shuffle, passengers, cells, queues, counters, max_steps):
+    """ PlaneModel.run_model over the tables - returns the number of steps taken
+
+    Passenger a may not enter the plane before step passengers[a][A_ARRIVAL]. Only simulated steps
+    count towards max_steps, not the ones skipped while waiting for arrivals.
+    """
+    n = len(passengers)
+    normal = queues[Q_NORMAL]
+    prio = queues[Q_PRIO]
+    prio_tag = queues[Q_PRIO_TAG]
+    entrance = cells[ENTRANCE]
+    boarded = 0
+    normal_len = 0
+    steps = 0
+    simulated = 0
+    while simulated < max_steps:
+        # priority agents first, in insertion order; the buffer is compacted to the live entries
+        prio_len = 0
+        for i in range(counters[PRIO_LEN]):
+            if passengers[prio[i]][A_TAG] == prio_tag[i]:
+                prio[prio_len] = prio[i]
+                prio_tag[prio_len] = prio_tag[i]
+                prio_len += 1
+        counters[PRIO_LEN] = prio_len
+        for i in range(prio_len):
+            a = prio[i]
+            if passengers[a][A_TAG] != 0:
+                _agent_step(a, shuffle, passengers, cells, queues, counters)
+
+        live = 0
+        for i in range(normal_len):
+            if passengers[normal[i]][A_NORMAL] == 1:
+                normal[live] = normal[i]
+                live += 1
+        normal_len = live
+        for i in range(normal_len):
+            a = normal[i]
+            if passengers[a][A_NORMAL] == 1:
+                _agent_step(a, shuffle, passengers, cells, queues, counters)
+        steps += 1
+        simulated += 1
+
+        if entrance[C_FIRST] == -1:
+            entrance[C_STATE] = FREE
+
+        if entrance[C_STATE] == FREE and boarded < n and passengers[boarded][A_ARRIVAL] <= steps - 1:
+            a = boarded
+            boarded += 1
+            passengers[a][A_STATE] = GOING
+            passengers[a][A_NORMAL] = 1
+            counters[LIVE] += 1
+            normal[normal_len] = a
+            normal_len += 1
+            _place(a, 0, AISLE, passengers, cells)
+            entrance[C_STATE] = TAKEN
+
+        if counters[LIVE] == 0:
+            if boarded == n:
+                return steps
+            # the cabin is empty, so jump straight to the arrival of the next passenger
+            if passengers[boarded][A_ARRIVAL] > steps:
+                steps = passengers[boarded][A_ARRIVAL]
+    raise RuntimeError("Boarding did not finish within max_steps")
+
+
+def model_arrays(model):
+    """ Extracts the initial state of a PlaneModel which has not been stepped yet
+
+    Passengers are numbered in boarding order, i.e. the reverse of model.boarding_queue.
+    """
+    queue = list(reversed(model.boarding_queue))
+    passengers = np.zeros((len(queue), 12), dtype=np.int64)
+    passengers[:, A_SEAT_X] = [p.seat_pos[0] for p in queue]
+    passengers[:, A_SEAT_Y] = [p.seat_pos[1] for p in queue]
+    passengers[:, A_BAGGAGE] = [p.baggage for p in queue]
+    passengers[:, A_ARRIVAL] = [p.arrival for p in queue]
+    passengers[:, A_STATE] = INACTIVE
+    passengers[:, [A_X, A_Y, A_NEXT, A_PREV]] = -1
+    cells = np.zeros((CELLS, 7), dtype=np.int64)
+    cells[[x * HEIGHT + AISLE for x in range(WIDTH)], C_STATE] = FREE
+    cells[:, [C_FIRST, C_LAST]] = -1
+    return {
+        'passengers': passengers,
+        'cells': cells,
+        # every passenger is added at most twice per shuffle and shuffles at most twice
+        'queues': np.zeros((3, 4 * len(passengers) + 1), dtype=np.int64),
+        'counters': np.zeros(3, dtype=np.int64)
+    }
+
+
+def run_boarding(model, max_steps=100000):
+    """ Runs a freshly created PlaneModel to completion in one call and returns its step count
+
+    The result equals model.schedule.steps after stepping the model until it stops running.
+    The model itself is left untouched. Raises RuntimeError when more than max_steps steps
+    would have to be simulated.
+    """
+    return run_arrays(model_arrays(model), model.shuffle_enable, max_steps)
+
+
+def run_arrays(arrays, shuffle_enable, max_steps=100000):
+    """ Runs a boarding from the initial state given by model_arrays and returns its step count """
+    if not NUMBA_AVAILABLE:
+        # plain Python indexes lists much faster than numpy arrays
+        arrays = {key: value.tolist() for key, value in arrays.items()}
+    return _board(bool(shuffle_enable), arrays['passengers'], arrays['cells'], arrays['queues'], arrays['counters'],
+                  max_steps)
+
+
+if __name__ == "__main__":
+    import arrivals
+    from plane import PlaneModel
+
+    print(f"Numba available: {NUMBA_AVAILABLE}")
+    # compile (or load from the cache) before anything is timed
+    run_boarding(PlaneModel('Random', seed=0))
+    mismatches = 0
+    runs = 0
+    mesa_total = 0.0
+    kernel_total = 0.0
+    for method in PlaneModel.method_types:
+        for shuffle_enable, common_bags, arrival_process in ((True, 'normal', None), (False, 'normal', None),
+                                                             (True, 0, None), (False, 3, None),
+                                                             (True, 'normal', arrivals.Poisson(0.1)),
+                                                             (True, 'normal', arrivals.Stragglers(
+                                                                 arrivals.GroupCalls(150, 20), 0.1, 300)),
+                                                             (True, 'normal', arrivals.Stragglers(
+                                                                 arrivals.Constant(1), 0.05, 60000))):
+            for seed in range(10):
+                model = PlaneModel(method, shuffle_enable, common_bags, seed=seed, arrivals=arrival_process)
+                start = time.perf_counter()
+                steps = run_boarding(model)
+                kernel_total += time.perf_counter() - start
+
+                start = time.perf_counter()
+                while model.running:
+                    model.step()
+                mesa_total += time.perf_counter() - start
+
+                runs += 1
+                if steps != model.schedule.steps:
+                    mismatches += 1
+                    print(f"  MISMATCH {method}, shuffle={shuffle_enable}, bags={common_bags}, seed={seed}, "
+                          f"arrivals={type(arrival_process).__name__}: "
+                          f"kernel {steps}, model {model.schedule.steps}")
+    print(f"Mismatches: {mismatches}")
+    print(f"Mesa model: {mesa_total:.2f} s, kernel: {kernel_total:.2f} s")
+    print(f"Per run: Mesa model {mesa_total / runs * 1000:.2f} ms, kernel {kernel_total / runs * 1000:.2f} ms "
+          f"({mesa_total / kernel_total:.1f}x faster)")
@@ -1,25 +1,64 @@
-from mesa import Model, Agent
+from mesa import Model
 from mesa.space import MultiGrid
 import queue_method
 import methods
 import numpy as np
 
 
-def baggage_normal():
+def baggage_normal(rng=np.random, mean=7, std=2):
     """ Generates a positive integer number from normal distribution """
-    value = round(np.random.normal(7, 2), 0)
+    value = round(rng.normal(mean, std), 0)
     while value < 0:
-        value = round(np.random.normal(7, 2), 0)
-    return value
+        value = round(rng.normal(mean, std), 0)
+    return int(value)
 
 
-class PassengerAgent(Agent):
+# Passenger states - PassengerAgent keeps the code, its state property gives the name
+INACTIVE, GOING, SHUFFLE_CHECK, SHUFFLE, BACK, BAGGAGE, SEATING, FINISHED = range(8)
+STATE_NAMES = ('INACTIVE', 'GOING', 'SHUFFLE CHECK', 'SHUFFLE', 'BACK', 'BAGGAGE', 'SEATING', 'FINISHED')
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+# Patch states - seats and walls start without any state
+NO_STATE, FREE, TAKEN = range(3)
+PATCH_STATE_NAMES = (None, 'FREE', 'TAKEN')
+PATCH_STATE_CODES = {name: code for code, name in enumerate(PATCH_STATE_NAMES)}
+
+# Type of every cell of the plane, LAYOUT[x][y], and one position tuple per cell, POSITIONS[x][y], shared by all models
+LAYOUT = tuple(tuple('CORRIDOR' if y == 3 else 'SEAT' if 3 <= x <= 18 else 'WALL' for y in range(7))
+               for x in range(21))
+POSITIONS = tuple(tuple((x, y) for y in range(7)) for x in range(21))
+
+
+class SlottedAgent:
+    """ Slotted counterpart of mesa.Agent (which has no __slots__), offering the same interface """
+    __slots__ = ('unique_id', 'model', 'pos')
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+
+    def step(self):
+        pass
+
+    def advance(self):
+        pass
+
+    @property
+    def random(self):
+        return self.model.random
+
+
+class PassengerAgent(SlottedAgent):
     """ An agent with a fixed seat assigned """
+    __slots__ = ('seat_pos', 'group', 'state_code', 'arrival', 'shuffle_dist', 'shuffle', 'baggage')
+
     def __init__(self, unique_id, model, seat_pos, group):
         super().__init__(unique_id, model)
-        self.seat_pos = seat_pos
+        self.seat_pos = POSITIONS[seat_pos[0]][seat_pos[1]]
         self.group = group
-        self.state = 'INACTIVE'
+        self.state_code = INACTIVE
+        self.arrival = 0
         self.shuffle_dist = 0
         if self.model.shuffle_enable:
             self.shuffle = True
@@ -27,101 +66,119 @@ class PassengerAgent(Agent):
             self.shuffle = False
 
         if self.model.common_bags == 'normal':
-            self.baggage = baggage_normal()
+            self.baggage = baggage_normal(self.model.np_random, self.model.bags_mean, self.model.bags_std)
         else:
             self.baggage = self.model.common_bags
 
+    @property
+    def state(self):
+        return STATE_NAMES[self.state_code]
+
+    @state.setter
+    def state(self, name):
+        self.state_code = STATE_CODES[name]
+
     def step(self):
-        if self.state == 'GOING' and self.model.get_patch((self.pos[0] + 1, self.pos[1])).state == 'FREE' and self.model.get_patch((self.pos[0] + 1, self.pos[1])).shuffle == 0:
-            if self.model.get_patch((self.pos[0] + 1, self.pos[1])).back == 0 or self.model.get_patch((self.pos[0] + 1, self.pos[1])).allow_shuffle is True:
-                self.model.get_patch((self.pos[0] + 1, self.pos[1])).allow_shuffle = False
+        patches = self.model.patches
+        if self.state_code == GOING:
+            front = patches[self.pos[0] + 1][self.pos[1]]
+            if front.state_code == FREE and front.shuffle == 0 and (front.back == 0 or front.allow_shuffle is True):
+                front.allow_shuffle = False
                 self.move(1, 0)
                 if self.shuffle:
                     if self.pos[0] + 1 == self.seat_pos[0]:
-                        self.state = 'SHUFFLE CHECK'
+                        self.state_code = SHUFFLE_CHECK
                 if self.pos[0] == self.seat_pos[0]:
                     if self.baggage > 0:
-                        self.state = 'BAGGAGE'
+                        self.state_code = BAGGAGE
                     else:
-                        self.state = 'SEATING'
+                        self.state_code = SEATING
 
-        elif self.state == 'SHUFFLE':
-            if self.pos[1] == 3 and self.model.get_patch((self.pos[0] + 1, self.pos[1])).state == 'FREE':
+        elif self.state_code == SHUFFLE:
+            if self.pos[1] == 3 and patches[self.pos[0] + 1][3].state_code == FREE:
                 if self.pos[0] == self.seat_pos[0]:
-                    self.shuffle_dist = self.model.get_patch((self.pos[0], self.pos[1])).shuffle
-                    self.model.get_patch((self.pos[0], self.pos[1])).shuffle -= 1
+                    patch = patches[self.pos[0]][3]
+                    self.shuffle_dist = patch.shuffle
+                    patch.shuffle -= 1
                 self.move(1, 0)
                 self.shuffle_dist -= 1
                 if self.shuffle_dist == 0:
-                    self.state = 'BACK'
+                    self.state_code = BACK
                     if self.pos[0] - self.seat_pos[0] == 2:
                         self.model.schedule.safe_remove_priority(self)
                         self.model.schedule.add_priority(self)
             else:
-                if self.pos[1] > 3 and self.model.get_patch((self.pos[0], self.pos[1] - 1)).state == 'FREE':
+                if self.pos[1] > 3 and patches[self.pos[0]][self.pos[1] - 1].state_code == FREE:
                     self.move(0, -1)
-                elif self.pos[1] < 3 and self.model.get_patch((self.pos[0], self.pos[1] + 1)).state == 'FREE':
+                elif self.pos[1] < 3 and patches[self.pos[0]][self.pos[1] + 1].state_code == FREE:
                     self.move(0, 1)
 
-        elif self.state == 'BACK' and self.model.get_patch((self.pos[0] - 1, self.pos[1])).state == 'FREE' and self.model.get_patch((self.pos[0] - 1, self.pos[1])).allow_shuffle is False:
-            self.move(-1, 0)
-            if self.pos[0] == self.seat_pos[0]:
-                self.state = 'SEATING'
-                self.model.get_patch((self.pos[0], self.pos[1])).back -= 1
-                if self.model.get_patch((self.pos[0], self.pos[1])).back == 0:
-                    self.model.get_patch((self.pos[0], self.pos[1])).ongoing_shuffle = False
+        elif self.state_code == BACK:
+            behind = patches[self.pos[0] - 1][self.pos[1]]
+            if behind.state_code == FREE and behind.allow_shuffle is False:
+                self.move(-1, 0)
+                if self.pos[0] == self.seat_pos[0]:
+                    self.state_code = SEATING
+                    patch = patches[self.pos[0]][self.pos[1]]
+                    patch.back -= 1
+                    if patch.back == 0:
+                        patch.ongoing_shuffle = False
 
-        elif self.state == 'BAGGAGE':
+        elif self.state_code == BAGGAGE:
             if self.baggage > 1:
                 self.baggage -= 1
             else:
-                self.state = 'SEATING'
+                self.state_code = SEATING
 
-        elif self.state == 'SEATING':
+        elif self.state_code == SEATING:
             if self.seat_pos[1] in (0, 1, 2):
                 self.move(0, -1)
             else:
                 self.move(0, 1)
             if self.pos[1] == self.seat_pos[1]:
-                self.state = 'FINISHED'
+                self.state_code = FINISHED
                 self.model.schedule.safe_remove(self)
                 self.model.schedule.safe_remove_priority(self)
 
-        if self.state == 'SHUFFLE CHECK' and self.model.get_patch((self.pos[0] + 1, self.pos[1])).state == 'FREE' and self.model.get_patch((self.pos[0] + 1, self.pos[1])).ongoing_shuffle == False:
-            try:
-                shuffle_agents = []
-                if self.seat_pos[1] in (0, 1):
-                    for y in range(2, self.seat_pos[1], -1):
-                        local_agent = self.model.get_passenger((self.seat_pos[0], y))
-                        if local_agent is not None:
-                            if local_agent.state != 'FINISHED':
-                                raise Exception()
-                            shuffle_agents.append(local_agent)
-                elif self.seat_pos[1] in (5, 6):
-                    for y in range(4, self.seat_pos[1]):
-                        local_agent = self.model.get_passenger((self.seat_pos[0], y))
-                        if local_agent is not None:
-                            if local_agent.state != 'FINISHED':
-                                raise Exception()
-                            shuffle_agents.append(local_agent)
-                shuffle_count = len(shuffle_agents)
-                if shuffle_count != 0:
-                    self.model.get_patch((self.seat_pos[0], 3)).shuffle = shuffle_count
-                    self.model.get_patch((self.seat_pos[0], 3)).back = shuffle_count
-                    self.model.get_patch((self.seat_pos[0], 3)).allow_shuffle = True
-                    self.model.get_patch((self.pos[0] + 1, self.pos[1])).ongoing_shuffle = True
-                    for local_agent in shuffle_agents:
-                        local_agent.state = 'SHUFFLE'
-                        self.model.schedule.safe_remove(local_agent)
-                        self.model.schedule.add_priority(local_agent)
-                self.state = 'GOING'
-            except Exception:
-                pass
+        if self.state_code == SHUFFLE_CHECK:
+            front = patches[self.pos[0] + 1][self.pos[1]]
+            if front.state_code == FREE and front.ongoing_shuffle == False:
+                try:
+                    shuffle_agents = []
+                    if self.seat_pos[1] in (0, 1):
+                        for y in range(2, self.seat_pos[1], -1):
+                            local_agent = self.model.get_passenger((self.seat_pos[0], y))
+                            if local_agent is not None:
+                                if local_agent.state_code != FINISHED:
+                                    raise Exception()
+                                shuffle_agents.append(local_agent)
+                    elif self.seat_pos[1] in (5, 6):
+                        for y in range(4, self.seat_pos[1]):
+                            local_agent = self.model.get_passenger((self.seat_pos[0], y))
+                            if local_agent is not None:
+                                if local_agent.state_code != FINISHED:
+                                    raise Exception()
+                                shuffle_agents.append(local_agent)
+                    shuffle_count = len(shuffle_agents)
+                    if shuffle_count != 0:
+                        aisle = patches[self.seat_pos[0]][3]
+                        aisle.shuffle = shuffle_count
+                        aisle.back = shuffle_count
+                        aisle.allow_shuffle = True
+                        front.ongoing_shuffle = True
+                        for local_agent in shuffle_agents:
+                            local_agent.state_code = SHUFFLE
+                            self.model.schedule.safe_remove(local_agent)
+                            self.model.schedule.add_priority(local_agent)
+                    self.state_code = GOING
+                except Exception:
+                    pass
 
     def move(self, m_x, m_y):
-        self.model.get_patch((self.pos[0], self.pos[1])).state = 'FREE'
-        self.model.grid.move_agent(self, (self.pos[0] + m_x, self.pos[1] + m_y))
-        self.model.get_patch((self.pos[0], self.pos[1])).state = 'TAKEN'
+        patches = self.model.patches
+        patches[self.pos[0]][self.pos[1]].state_code = FREE
+        self.model.grid.move_agent(self, POSITIONS[self.pos[0] + m_x][self.pos[1] + m_y])
+        patches[self.pos[0]][self.pos[1]].state_code = TAKEN
 
     def store_luggage(self):
         # storing luggage and stopping queue
@@ -131,16 +188,32 @@ class PassengerAgent(Agent):
         return "ID {}\t: {}".format(self.unique_id, self.seat_pos)
 
 
-class PatchAgent(Agent):
-    def __init__(self, unique_id, model, patch_type, state=None):
+class PatchAgent(SlottedAgent):
+    """ A single cell of the plane, its type read from the shared LAYOUT """
+    __slots__ = ('state_code', 'shuffle', 'back', 'allow_shuffle', 'ongoing_shuffle')
+
+    def __init__(self, unique_id, model, *, state_code=NO_STATE):
         super().__init__(unique_id, model)
-        self.type = patch_type
-        self.state = state
+        if state_code not in (NO_STATE, FREE, TAKEN):
+            raise ValueError("Unknown patch state code: {!r}".format(state_code))
+        self.state_code = state_code
         self.shuffle = 0
         self.back = 0
         self.allow_shuffle = False
         self.ongoing_shuffle = False
 
+    @property
+    def type(self):
+        return LAYOUT[self.pos[0]][self.pos[1]]
+
+    @property
+    def state(self):
+        return PATCH_STATE_NAMES[self.state_code]
+
+    @state.setter
+    def state(self, name):
+        self.state_code = PATCH_STATE_CODES[name]
+
     def step(self):
         pass
 
@@ -159,7 +232,10 @@ class PlaneModel(Model):
         'Steffen Modified': methods.steffen_modified
     }
 
-    def __init__(self, method, shuffle_enable=True, common_bags='normal'):
+    def __init__(self, method, shuffle_enable=True, common_bags='normal', seed=None, arrivals=None,
+                 bags_mean=7, bags_std=2, load_factor=1):
+        # Mesa seeds self.random from the 'seed' keyword; baggage is drawn from numpy, so it gets its own generator
+        self.np_random = np.random if seed is None else np.random.RandomState(seed)
         self.grid = MultiGrid(21, 7, False)
         self.running = True
         self.schedule = queue_method.QueueActivation(self)
@@ -167,52 +243,66 @@ class PlaneModel(Model):
         self.entry_free = True
         self.shuffle_enable = shuffle_enable
         self.common_bags = common_bags
+        self.bags_mean = bags_mean
+        self.bags_std = bags_std
         # Create agents and splitting them into separate boarding groups accordingly to a given method
         self.boarding_queue = []
         self.method(self)
 
-        # Create patches representing corridor, seats and walls
+        # Leave a random part of the seats empty
+        if load_factor < 1:
+            empty = set(self.random.sample(range(len(self.boarding_queue)),
+                                           len(self.boarding_queue) - round(load_factor * len(self.boarding_queue))))
+            self.boarding_queue = [a for i, a in enumerate(self.boarding_queue) if i not in empty]
+
+        # Without an arrival process the door is never short of passengers; otherwise they board in order of arrival
+        if arrivals is not None:
+            door = list(reversed(self.boarding_queue))
+            for agent, arrival in zip(door, arrivals(door, self.np_random)):
+                agent.arrival = arrival
+            door.sort(key=lambda a: a.arrival)
+            self.boarding_queue = list(reversed(door))
+
+        # Create patches representing corridor, seats and walls (types given by LAYOUT)
+        self.patches = [[None] * 7 for _ in range(21)]
         id = 97
         for row in (0, 1, 2, 4, 5, 6):
-            for col in (0, 1, 2):
-                patch = PatchAgent(id, self, 'WALL')
-                self.grid.place_agent(patch, (col, row))
-                id += 1
-            for col in range(3, 19):
-                patch = PatchAgent(id, self, 'SEAT')
-                self.grid.place_agent(patch, (col, row))
-                id += 1
-            for col in (19, 20):
-                patch = PatchAgent(id, self, 'WALL')
-                self.grid.place_agent(patch, (col, row))
+            for col in range(21):
+                patch = PatchAgent(id, self)
+                self.grid.place_agent(patch, POSITIONS[col][row])
+                self.patches[col][row] = patch
                 id += 1
         for col in range(21):
-            patch = PatchAgent(id, self, 'CORRIDOR', 'FREE')
-            self.grid.place_agent(patch, (col, 3))
+            patch = PatchAgent(id, self, state_code=FREE)
+            self.grid.place_agent(patch, POSITIONS[col][3])
+            self.patches[col][3] = patch
             id += 1
 
     def step(self):
+        # Nobody on board and the next passenger still on the way - skip the idle ticks until they arrive
+        if self.schedule.get_agent_count() == 0 and len(self.boarding_queue) > 0 and \
+                self.boarding_queue[-1].arrival > self.schedule.steps:
+            self.schedule.steps = self.schedule.time = self.boarding_queue[-1].arrival
+        tick = self.schedule.steps
         self.schedule.step()
 
+        entrance = self.patches[0][3]
         if len(self.grid.get_cell_list_contents((0, 3))) == 1:
-            self.get_patch((0, 3)).state = 'FREE'
+            entrance.state_code = FREE
 
-        if self.get_patch((0, 3)).state == 'FREE' and len(self.boarding_queue) > 0:
+        if entrance.state_code == FREE and len(self.boarding_queue) > 0 and \
+                self.boarding_queue[-1].arrival <= tick:
             a = self.boarding_queue.pop()
-            a.state = 'GOING'
+            a.state_code = GOING
             self.schedule.add(a)
-            self.grid.place_agent(a, (0, 3))
-            self.get_patch((0, 3)).state = 'TAKEN'
+            self.grid.place_agent(a, POSITIONS[0][3])
+            entrance.state_code = TAKEN
 
-        if self.schedule.get_agent_count() == 0:
+        if self.schedule.get_agent_count() == 0 and len(self.boarding_queue) == 0:
             self.running = False
 
     def get_patch(self, pos):
-        agents = self.grid.get_cell_list_contents(pos)
-        for agent in agents:
-            if isinstance(agent, PatchAgent):
-                return agent
-        return None
+        return self.patches[pos[0]][pos[1]]
 
     def get_passenger(self, pos):
         agents = self.grid.get_cell_list_contents(pos)
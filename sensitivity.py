@@ -0,0 +1,206 @@
+""" Sensitivity analysis - which simulation parameters actually drive the boarding time
+
+Sobol designs (Saltelli sampling, first-order and total indices) and Morris designs (elementary effects) are
+drawn in the unit cube and mapped onto the parameters in PARAMETERS. Every point is boarded with the kernel,
+in batches spread over all CPU cores. Points sharing a row of the design (Sobol) or a trajectory (Morris) share
+their seed, so the indices compare parameter values rather than random draws. When a path is given, the design
+and every finished batch are stored there and a later run with the same path resumes where it stopped.
+"""
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import kernel
+from plane import PlaneModel
+
+# PlaneModel keyword arguments - ranges of continuous parameters, lists of values of categorical ones
+PARAMETERS = {
+    'bags_mean': (3, 11),
+    'bags_std': (0, 4),
+    'load_factor': (0.5, 1),
+    'shuffle_enable': [False, True],
+    'method': list(PlaneModel.method_types.keys())
+}
+
+
+def scale(unit, parameters=PARAMETERS):
+    """ Maps a point of the unit cube onto a dictionary of parameter values """
+    values = {}
+    for u, (name, space) in zip(unit, parameters.items()):
+        if isinstance(space, list):
+            values[name] = space[min(int(u * len(space)), len(space) - 1)]
+        else:
+            values[name] = space[0] + u * (space[1] - space[0])
+    return values
+
+
+def sobol_design(samples, dimensions, rng):
+    """ Saltelli design - matrices A, B and AB_1 ... AB_d stacked, samples * (dimensions + 2) rows """
+    a = rng.random_sample((samples, dimensions))
+    b = rng.random_sample((samples, dimensions))
+    blocks = [a, b]
+    for i in range(dimensions):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        blocks.append(ab)
+    return np.vstack(blocks)
+
+
+def morris_design(trajectories, levels, rng):
+    """ Morris design - trajectories of len(levels) + 1 points, each moving one parameter by its delta
+
+    levels holds the number of grid levels of every parameter; a parameter with L levels moves by
+    L / (2 * (L - 1)), so its starting levels and the ones reached from them cover the grid evenly.
+    """
+    starts = []
+    deltas = []
+    for count in levels:
+        grid = np.arange(count) / (count - 1)
+        deltas.append(count / (2 * (count - 1)))
+        starts.append(grid[grid <= 1 - deltas[-1] + 1e-9])
+    points = []
+    for _ in range(trajectories):
+        point = np.array([rng.choice(start) for start in starts])
+        points.append(point.copy())
+        for i in rng.permutation(len(levels)):
+            point[i] += deltas[i]
+            points.append(point.copy())
+    return np.array(points)
+
+
+def board_batch(batch):
+    """ Boards every (parameters, seed) pair of the batch with the kernel and returns the step counts """
+    steps = []
+    for values, seed in batch:
+        model = PlaneModel(seed=seed, **values)
+        steps.append(kernel.run_boarding(model))
+    return steps
+
+
+def bootstrap(estimate, samples, resamples, rng, confidence=0.95):
+    """ Percentile bootstrap interval of estimate(indices) over resampled rows """
+    values = np.array([estimate(rng.randint(0, samples, samples)) for _ in range(resamples)])
+    tail = (1 - confidence) / 2 * 100
+    return np.percentile(values, tail, axis=0), np.percentile(values, 100 - tail, axis=0)
+
+
+class SensitivityAnalysis:
+    """ A Sobol or Morris analysis of the boarding time over the given parameters
+
+    samples is the number of base rows for Sobol (samples * (d + 2) runs) or of trajectories
+    for Morris (samples * (d + 1) runs).
+    """
+    def __init__(self, design='sobol', samples=1000, parameters=PARAMETERS, seed=0, path=None):
+        if design not in ('sobol', 'morris'):
+            raise ValueError("Unknown design: {}".format(design))
+        self.design = design
+        self.samples = samples
+        self.parameters = parameters
+        self.seed = seed
+        self.path = path
+        dimensions = len(parameters)
+        rng = np.random.RandomState(seed)
+        if design == 'sobol':
+            self.unit = sobol_design(samples, dimensions, rng)
+            # rows j of A, B and every AB_i share a seed
+            self.rows = np.tile(np.arange(samples), dimensions + 2)
+        else:
+            # categorical parameters get a level per value (scale maps level k to value k), continuous ones 4
+            levels = [max(len(space), 2) if isinstance(space, list) else 4 for space in parameters.values()]
+            self.unit = morris_design(samples, levels, rng)
+            self.rows = np.repeat(np.arange(samples), dimensions + 1)
+        self.results = np.full(len(self.unit), np.nan)
+
+        if path is not None and os.path.exists(path):
+            with np.load(path) as saved:
+                if 'settings' not in saved or saved['settings'].tolist() != self.settings() or \
+                        saved['unit'].shape != self.unit.shape or not np.allclose(saved['unit'], self.unit):
+                    raise ValueError("{} holds a different analysis".format(path))
+                self.results = saved['results']
+
+    def settings(self):
+        """ Design type, seed and the space of every parameter, as stored next to the results """
+        return [self.design, repr(self.seed)] + ["{}={!r}".format(name, space)
+                                                 for name, space in self.parameters.items()]
+
+    def point_seed(self, row):
+        """ Seed of the model boarded for every point of the given design row or trajectory """
+        return int(np.random.SeedSequence([self.seed, int(row)]).generate_state(1)[0])
+
+    def save(self):
+        """ Writes the design and the results so far, replacing the previous file at once """
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez(file, unit=self.unit, results=self.results, settings=self.settings())
+        os.replace(temporary, self.path)
+
+    def run(self, processes=None, batch_size=250, progress=True):
+        """ Evaluates every point which has no result yet """
+        pending = np.flatnonzero(np.isnan(self.results))
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        jobs = [[(scale(self.unit[p], self.parameters), self.point_seed(self.rows[p])) for p in batch]
+                for batch in batches]
+        start_time = time.perf_counter()
+        with Pool(processes) as pool:
+            for done, (batch, steps) in enumerate(zip(batches, pool.imap(board_batch, jobs)), start=1):
+                self.results[batch] = steps
+                if self.path is not None:
+                    self.save()
+                if progress and done % 20 == 0:
+                    print(f"  --> {done}/{len(batches)} batches, {time.perf_counter() - start_time:.0f} s")
+        return self.results
+
+    def indices(self, resamples=1000, confidence=0.95):
+        """ Sobol: first-order S1 and total ST indices, Morris: mu_star and sigma of the elementary effects
+
+        Returns a dictionary per parameter, with bootstrap confidence intervals of S1, ST and mu_star.
+        """
+        if np.isnan(self.results).any():
+            raise ValueError("The analysis has not been run to completion")
+        rng = np.random.RandomState(self.seed)
+        d = len(self.parameters)
+        n = self.samples
+        if self.design == 'sobol':
+            y = self.results.reshape(d + 2, n)
+            f_a, f_b, f_ab = y[0], y[1], y[2:]
+
+            def estimate(rows):
+                variance = np.var(np.concatenate((f_a[rows], f_b[rows])))
+                first = np.mean(f_b[rows] * (f_ab[:, rows] - f_a[rows]), axis=1) / variance
+                total = 0.5 * np.mean((f_a[rows] - f_ab[:, rows]) ** 2, axis=1) / variance
+                return np.concatenate((first, total))
+
+            values = estimate(np.arange(n))
+            low, high = bootstrap(estimate, n, resamples, rng, confidence)
+            return {name: {'S1': values[i], 'S1_conf': (low[i], high[i]),
+                           'ST': values[d + i], 'ST_conf': (low[d + i], high[d + i])}
+                    for i, name in enumerate(self.parameters)}
+
+        unit = self.unit.reshape(n, d + 1, d)
+        y = self.results.reshape(n, d + 1)
+        effects = np.empty((n, d))
+        for t in range(n):
+            for k in range(d):
+                moved = np.argmax(unit[t, k + 1] - unit[t, k])
+                effects[t, moved] = (y[t, k + 1] - y[t, k]) / (unit[t, k + 1, moved] - unit[t, k, moved])
+
+        def estimate(rows):
+            return np.mean(np.abs(effects[rows]), axis=0)
+
+        mu_star = estimate(np.arange(n))
+        low, high = bootstrap(estimate, n, resamples, rng, confidence)
+        sigma = np.std(effects, axis=0, ddof=1)
+        return {name: {'mu_star': mu_star[i], 'mu_star_conf': (low[i], high[i]), 'sigma': sigma[i]}
+                for i, name in enumerate(self.parameters)}
+
+
+if __name__ == "__main__":
+    analysis = SensitivityAnalysis('sobol', samples=2000, path='sobol_boarding.npz')
+    print(f"Sobol analysis: {len(analysis.unit)} runs, {int(np.isnan(analysis.results).sum())} to go\n")
+    analysis.run()
+    print(f"\n{'Parameter':<16}{'S1':>8}{'95% CI':>20}{'ST':>8}{'95% CI':>20}")
+    for name, index in analysis.indices().items():
+        print(f"{name:<16}{index['S1']:>8.3f}{'({:.3f}, {:.3f})'.format(*index['S1_conf']):>20}"
+              f"{index['ST']:>8.3f}{'({:.3f}, {:.3f})'.format(*index['ST_conf']):>20}")